@@ -0,0 +1,224 @@
+# analysis_core.py
+"""
+形態素解析結果を集計する純粋なヘルパー群。Streamlitや描画ライブラリに依存しないため、
+Streamlitアプリ (text_analyzer.py) と HTTP分析サービス (api_server.py) の両方から利用する。
+"""
+import re
+from bisect import bisect_right
+from collections import Counter
+from itertools import combinations
+
+import pandas as pd
+
+# 各分析で対象外とする名詞の品詞細分類1
+REPORT_NOUN_EXCLUSIONS = ['非自立', '数', '代名詞', '接尾']
+WORDCLOUD_NOUN_EXCLUSIONS = ['数', '非自立', '代名詞', '接尾']
+COOCCURRENCE_NOUN_EXCLUSIONS = ['非自立', '数', '代名詞', '接尾', 'サ変接続', '副詞可能']
+_SENTENCE_END_PATTERN = re.compile(r'[。！？]')
+
+def parse_morphemes(tagger_instance, text_input):
+    """指定したTaggerで入力テキストを形態素解析し、形態素のリストを返す (キャッシュなし)。"""
+    return list(iter_morphemes(tagger_instance, text_input))
+
+def iter_morphemes(tagger_instance, text_input):
+    """指定したTaggerで入力テキストを形態素解析し、形態素を1つずつ返すジェネレータ。"""
+    node = tagger_instance.parseToNode(text_input)
+    while node:
+        if node.surface:
+            features = node.feature.split(',')
+            original_form = features[6] if features[6] != '*' else node.surface
+            reading = features[7] if len(features) > 7 and features[7] != '*' else ''
+            pronunciation = features[8] if len(features) > 8 and features[8] != '*' else ''
+            yield {
+                '表層形': node.surface, '原形': original_form,
+                '品詞': features[0], '品詞細分類1': features[1], '品詞細分類2': features[2],
+                '品詞細分類3': features[3], '活用型': features[4], '活用形': features[5],
+                '読み': reading, '発音': pronunciation
+            }
+        node = node.next
+
+def filter_morphemes(all_morphemes, target_pos_list, stop_words_set, 
+                     noun_subtype_exclusions=None, min_len_non_noun=0):
+    """指定された条件で形態素リストをフィルタリングする。"""
+    return list(iter_filtered_morphemes(all_morphemes, target_pos_list, stop_words_set,
+                                        noun_subtype_exclusions, min_len_non_noun))
+
+def iter_filtered_morphemes(morphemes_iter, target_pos_list, stop_words_set,
+                            noun_subtype_exclusions=None, min_len_non_noun=0):
+    """filter_morphemes のジェネレータ版。形態素のストリームを条件で絞り込んで順に返す。"""
+    if noun_subtype_exclusions is None:
+        noun_subtype_exclusions = COOCCURRENCE_NOUN_EXCLUSIONS
+    for m in morphemes_iter:
+        if is_target_morpheme(m, target_pos_list, stop_words_set, noun_subtype_exclusions, min_len_non_noun):
+            yield m
+
+def is_target_morpheme(m, target_pos_list, stop_words_set, noun_subtype_exclusions, min_len_non_noun=0):
+    """形態素1つが品詞・ストップワード・名詞細分類・長さの条件を満たすかを返す。"""
+    if m['品詞'] not in target_pos_list or m['原形'].lower() in stop_words_set:
+        return False
+    if m['品詞'] == '名詞' and m['品詞細分類1'] in noun_subtype_exclusions:
+        return False
+    if m['品詞'] != '名詞' and len(m['原形']) < min_len_non_noun:
+        return False
+    return True
+
+def attach_weights(items, weights):
+    """items の各要素と同じ位置の重みを (要素, 重み) の組にする。長さが異なる場合は ValueError。"""
+    if len(items) != len(weights):
+        raise ValueError(f"重みの数 ({len(weights)}) が要素数 ({len(items)}) と一致しません。")
+    return list(zip(items, weights))
+
+def morpheme_line_indices(text_input, all_morphemes):
+    """
+    各形態素が text_input の何行目 (0始まり) に現れるかを返す。
+    MeCabは改行を読み飛ばすため、表層形を原文の先頭から順に照合して位置を求める。
+    """
+    line_starts = [0] + [match.end() for match in re.finditer('\n', text_input)]
+    line_indices = []
+    search_pos = 0
+    for m in all_morphemes:
+        found_pos = text_input.find(m['表層形'], search_pos)
+        if found_pos < 0:
+            raise ValueError(f"形態素 '{m['表層形']}' が原文の中に見つかりません。")
+        line_indices.append(bisect_right(line_starts, found_pos) - 1)
+        search_pos = found_pos + len(m['表層形'])
+    return line_indices
+
+def build_word_report(all_morphemes, target_pos_list, stop_words_set):
+    """
+    形態素リストから単語出現レポートのDataFrameを生成する (キャッシュなし)。
+    形態素は1回だけ順に走査するため、ジェネレータを渡せば全形態素を保持せずに集計できる。
+    """
+    return build_weighted_word_report(((m, 1) for m in all_morphemes), target_pos_list, stop_words_set)
+
+def build_weighted_word_report(weighted_morphemes, target_pos_list, stop_words_set):
+    """
+    (形態素, 重み) の組から単語出現レポートのDataFrameを生成する。
+    重み (重複クラスタの件数など) の分だけ、その形態素が出現したものとして数える。
+    """
+    total_morphemes_count = 0
+    word_counts = Counter()
+    representative_pos_info = {}  # 各単語の最後の出現時の品詞
+    for m, weight in weighted_morphemes:
+        total_morphemes_count += weight
+        if is_target_morpheme(m, target_pos_list, stop_words_set, REPORT_NOUN_EXCLUSIONS):
+            word_counts[m['原形']] += weight
+            representative_pos_info[m['原形']] = m['品詞']
+    return word_report_from_counts(word_counts, representative_pos_info, total_morphemes_count)
+
+def word_report_from_counts(word_counts, representative_pos_info, total_morphemes_count):
+    """集計済みの単語出現数 (原形 -> 出現数) と品詞情報から単語出現レポートのDataFrameを生成する。"""
+    if total_morphemes_count == 0:
+        return pd.DataFrame(), 0, 0
+    if not word_counts:
+        return pd.DataFrame(), total_morphemes_count, 0
+    report_data = []
+    for rank, (word, count) in enumerate(word_counts.most_common(), 1):
+        pos = representative_pos_info.get(word, '') 
+        frequency = (count / total_morphemes_count) * 100 if total_morphemes_count > 0 else 0
+        report_data.append({
+            '順位': rank, '単語 (原形)': word, '出現数': count,
+            '出現頻度 (%)': round(frequency, 3), '品詞': pos
+        })
+    return pd.DataFrame(report_data), total_morphemes_count, sum(word_counts.values())
+
+def select_cooccurrence_nodes(all_morphemes, target_pos_list, stop_words_set, node_min_freq):
+    """共起ネットワークのノード候補 (原形 -> 出現数、出現数 node_min_freq 以上) を返す。"""
+    return select_weighted_cooccurrence_nodes(((m, 1) for m in all_morphemes),
+                                              target_pos_list, stop_words_set, node_min_freq)
+
+def select_weighted_cooccurrence_nodes(weighted_morphemes, target_pos_list, stop_words_set, node_min_freq):
+    """(形態素, 重み) の組から、重み付き出現数が node_min_freq 以上のノード候補を返す。"""
+    word_counts = Counter()
+    for m, weight in weighted_morphemes:
+        if is_target_morpheme(m, target_pos_list, stop_words_set, COOCCURRENCE_NOUN_EXCLUSIONS, min_len_non_noun=2):
+            word_counts[m['原形']] += weight
+    return {word: count for word, count in word_counts.items() if count >= node_min_freq}
+
+def split_sentences(text_input):
+    """共起の単位となる文にテキストを分割する。"""
+    sentences = re.split(r'[。\n！？]+', text_input)
+    return [s.strip() for s in sentences if s.strip()]
+
+def count_cooccurrences(sentence_words_iter, node_candidates_dict):
+    """文ごとの原形リストから、ノード候補同士の共起回数 (ペア -> 回数) を数える。"""
+    return count_weighted_cooccurrences(((words, 1) for words in sentence_words_iter), node_candidates_dict)
+
+def count_weighted_cooccurrences(weighted_sentence_words, node_candidates_dict):
+    """(文の原形リスト, 重み) の組から、ノード候補同士の重み付き共起回数を数える。"""
+    cooccurrence_counts_map = Counter()
+    for words_in_sentence, weight in weighted_sentence_words:
+        words_in_sentence = [w for w in words_in_sentence if w in node_candidates_dict]
+        for pair in combinations(sorted(set(words_in_sentence)), 2):
+            cooccurrence_counts_map[pair] += weight
+    return cooccurrence_counts_map
+
+def iter_weighted_record_morphemes(tagger_instance, weighted_records):
+    """(レコード, 重み) の組をレコード (1行や1セル) ごとに形態素解析し、(形態素リスト, 重み) の組を順に返すジェネレータ。"""
+    for record, weight in weighted_records:
+        yield parse_morphemes(tagger_instance, record), weight
+
+def aggregate_weighted_records(weighted_records, report_pos_list, wc_pos_list, net_pos_list, stop_words_set,
+                               max_pairs=None):
+    """
+    (1レコードの形態素リスト, 重み) の組を1回だけ走査し、単語出現レポート・ワードクラウド・共起ネットワークの
+    集計をまとめて行う。形態素はレコード単位でしか保持しないため、ファイル全体を読み込まずに集計できる。
+    共起の単位は句点・感嘆符・疑問符またはレコード末尾で区切った文とする。
+    共起ペアの種類数が max_pairs を超えるたびに共起回数の多い max_pairs // 2 件だけを残すため、
+    刈り込みが起きた場合 ('pairs_pruned' が True) の共起回数は実際より少ないことがある。
+    """
+    total_morphemes_count = 0
+    report_counts, report_pos_info = Counter(), {}
+    wordcloud_counts, node_counts, pair_counts = Counter(), Counter(), Counter()
+    pairs_pruned = False
+
+    def add_sentence_pairs(sentence_words, weight):
+        for pair in combinations(sorted(sentence_words), 2):
+            pair_counts[pair] += weight
+
+    for record_morphemes, weight in weighted_records:
+        sentence_words = set()
+        for m in record_morphemes:
+            total_morphemes_count += weight
+            if is_target_morpheme(m, report_pos_list, stop_words_set, REPORT_NOUN_EXCLUSIONS):
+                report_counts[m['原形']] += weight
+                report_pos_info[m['原形']] = m['品詞']
+            if is_target_morpheme(m, wc_pos_list, stop_words_set, WORDCLOUD_NOUN_EXCLUSIONS):
+                wordcloud_counts[m['原形']] += weight
+            is_node_word = is_target_morpheme(m, net_pos_list, stop_words_set, COOCCURRENCE_NOUN_EXCLUSIONS,
+                                              min_len_non_noun=2)
+            if is_node_word:
+                node_counts[m['原形']] += weight
+            if _SENTENCE_END_PATTERN.search(m['表層形']):
+                add_sentence_pairs(sentence_words, weight)
+                sentence_words = set()
+            elif is_node_word:
+                sentence_words.add(m['原形'])
+        add_sentence_pairs(sentence_words, weight)
+        if max_pairs is not None and len(pair_counts) > max_pairs:
+            pair_counts = Counter(dict(pair_counts.most_common(max_pairs // 2)))
+            pairs_pruned = True
+    return {
+        'total_morphemes': total_morphemes_count, 'report_counts': report_counts, 'report_pos_info': report_pos_info,
+        'wordcloud_counts': wordcloud_counts, 'node_counts': node_counts, 'pair_counts': pair_counts,
+        'pairs_pruned': pairs_pruned
+    }
+
+def search_kwic(all_morphemes, keyword_str, search_key_type_str, window_int):
+    """形態素リストからキーワードの出現箇所を前後の文脈付きで抽出する (キャッシュなし)。"""
+    if not keyword_str.strip() or not all_morphemes:
+        return []
+    kwic_results_data = []
+    keyword_to_compare = keyword_str.strip().lower()
+    for i, morpheme_item in enumerate(all_morphemes):
+        target_text_in_morpheme = morpheme_item[search_key_type_str].lower()
+        if target_text_in_morpheme == keyword_to_compare:
+            left_start_idx = max(0, i - window_int)
+            left_context_str = "".join(m['表層形'] for m in all_morphemes[left_start_idx:i])
+            keyword_surface_form = morpheme_item['表層形']
+            right_end_idx = min(len(all_morphemes), i + 1 + window_int)
+            right_context_str = "".join(m['表層形'] for m in all_morphemes[i+1:right_end_idx])
+            kwic_results_data.append({
+                '左文脈': left_context_str, 'キーワード': keyword_surface_form, '右文脈': right_context_str
+            })
+    return kwic_results_data
@@ -0,0 +1,410 @@
+# api_server.py
+"""
+テキスト分析のHTTPサービス。Streamlitや描画ライブラリを読み込まずに、他システムからJSONで形態素解析・単語レポート・
+KWIC検索・共起エッジ抽出を利用するためのエントリポイント。標準ライブラリのHTTPサーバーで動作する。
+
+起動例: python api_server.py --host 127.0.0.1 --port 8765
+
+エンドポイント:
+  POST /tokenize      {"text": ...}
+  POST /report        {"text": ..., "pos": [...], "stop_words": [...]}
+  POST /kwic          {"text": ..., "keyword": ..., "mode": "原形"|"表層形", "window": 5}
+  POST /cooccurrence  {"text": ..., "pos": [...], "stop_words": [...], "node_min_freq": 2, "edge_min_freq": 1}
+  GET  /health, GET /metrics
+"""
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import MeCab
+
+from config import (TAGGER_OPTIONS, DEFAULT_TARGET_POS, GENERAL_STOP_WORDS, APP_VERSION,
+                    API_DEFAULT_HOST, API_DEFAULT_PORT, API_BATCH_MAX_SIZE, API_TOKENIZER_WORKERS,
+                    API_MORPH_CACHE_MAX_CHARS, API_MORPH_CACHE_MAX_TEXT_CHARS, API_MAX_BODY_BYTES,
+                    API_LATENCY_WINDOW)
+from analysis_core import (parse_morphemes, build_word_report, search_kwic,
+                           select_cooccurrence_nodes, split_sentences, count_cooccurrences)
+
+DEFAULT_STOP_WORDS = frozenset(word.strip().lower() for word in GENERAL_STOP_WORDS if word.strip())
+KWIC_MODES = ('原形', '表層形')
+
+
+class RequestError(Exception):
+    """リクエスト内容の不備 (HTTP 400 として返す)。"""
+
+
+class BatchTokenizer:
+    """
+    形態素解析要求を共有キューで受け、複数のワーカースレッドで処理する。
+    MeCab.Taggerはスレッドセーフではないため、各ワーカーは自分専用のTaggerを持つ。
+    ワーカーは待ち時間を設けず、その時点でキューに溜まっている要求だけをまとめて取り出し、
+    その中の同一テキストは1回だけ解析する。結果はテキスト単位のLRUキャッシュで再利用する。
+    キャッシュはテキストの合計文字数で上限を設け、長すぎるテキストは保持しない。
+    """
+
+    def __init__(self, metrics, max_batch_size=API_BATCH_MAX_SIZE, num_workers=API_TOKENIZER_WORKERS,
+                 cache_max_chars=API_MORPH_CACHE_MAX_CHARS, cache_max_text_chars=API_MORPH_CACHE_MAX_TEXT_CHARS):
+        self.metrics = metrics
+        self.max_batch_size = max_batch_size
+        self.cache_max_chars = cache_max_chars
+        self.cache_max_text_chars = min(cache_max_text_chars, cache_max_chars)
+        self._cache = OrderedDict()
+        self._cache_chars = 0
+        self._cache_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._workers = []
+        for i in range(max(1, num_workers)):
+            tagger_instance = MeCab.Tagger(TAGGER_OPTIONS)  # ワーカー専用 (スレッド間で共有しない)
+            tagger_instance.parse('')
+            self._workers.append(threading.Thread(target=self._run, args=(tagger_instance,),
+                                                  name=f"mecab-worker-{i}", daemon=True))
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, text_input, use_cache=True):
+        """
+        テキストの解析を予約し、形態素リストを結果に持つFutureを返す。
+        use_cache=False の場合は共有キャッシュを参照・更新しない (文単位の解析など再利用されにくいもの向け)。
+        """
+        future = Future()
+        use_cache = use_cache and len(text_input) <= self.cache_max_text_chars
+        cached = self._cache_get(text_input) if use_cache else None
+        if cached is not None:
+            self.metrics.record_cache(hit=True)
+            future.set_result(cached)
+        else:
+            if use_cache:
+                self.metrics.record_cache(hit=False)
+            self._queue.put((text_input, use_cache, future))
+        return future
+
+    def tokenize(self, text_input, use_cache=True):
+        return self.submit(text_input, use_cache).result()
+
+    def tokenize_many(self, texts, use_cache=True):
+        """複数テキストをまとめて投入し、同じバッチで解析されるようにする。"""
+        futures = [self.submit(t, use_cache) for t in texts]
+        return [f.result() for f in futures]
+
+    def _cache_get(self, text_input):
+        with self._cache_lock:
+            morphemes = self._cache.get(text_input)
+            if morphemes is not None:
+                self._cache.move_to_end(text_input)
+            return morphemes
+
+    def _cache_put(self, text_input, morphemes):
+        with self._cache_lock:
+            if text_input in self._cache:
+                self._cache.move_to_end(text_input)
+                return
+            self._cache[text_input] = morphemes
+            self._cache_chars += len(text_input)
+            while self._cache_chars > self.cache_max_chars:
+                evicted_text, _ = self._cache.popitem(last=False)
+                self._cache_chars -= len(evicted_text)
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self, tagger_instance):
+        while True:
+            batch = self._collect_batch()
+            pending = defaultdict(list)
+            cacheable = set()
+            for text_input, use_cache, future in batch:
+                pending[text_input].append(future)
+                if use_cache:
+                    cacheable.add(text_input)
+            started = time.perf_counter()
+            for text_input, futures in pending.items():
+                try:
+                    morphemes = parse_morphemes(tagger_instance, text_input) if text_input.strip() else []
+                    if text_input in cacheable:
+                        self._cache_put(text_input, morphemes)
+                except Exception as e_parse:
+                    for future in futures:
+                        future.set_exception(e_parse)
+                    continue
+                for future in futures:
+                    future.set_result(morphemes)
+            self.metrics.record_batch(len(batch), len(pending), time.perf_counter() - started)
+
+
+class ServiceMetrics:
+    """エンドポイントごとのリクエスト数・レイテンシ、バッチとキャッシュの統計を集計する。"""
+
+    def __init__(self, latency_window=API_LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.latency_window = latency_window
+        self.request_counts = defaultdict(int)
+        self.error_counts = defaultdict(int)
+        self.latencies = defaultdict(lambda: deque(maxlen=self.latency_window))
+        self.batch_count = 0
+        self.batched_texts = 0
+        self.parsed_texts = 0
+        self.parse_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def record_request(self, endpoint, latency_sec, ok=True):
+        with self._lock:
+            self.request_counts[endpoint] += 1
+            if not ok:
+                self.error_counts[endpoint] += 1
+            self.latencies[endpoint].append(latency_sec)
+
+    def record_batch(self, batch_size, unique_texts, parse_sec):
+        with self._lock:
+            self.batch_count += 1
+            self.batched_texts += batch_size
+            self.parsed_texts += unique_texts
+            self.parse_seconds += parse_sec
+
+    def record_cache(self, hit):
+        with self._lock:
+            if hit:
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+
+    @staticmethod
+    def _percentile(sorted_values, ratio):
+        if not sorted_values:
+            return 0.0
+        return sorted_values[min(len(sorted_values) - 1, int(ratio * len(sorted_values)))]
+
+    def snapshot(self):
+        with self._lock:
+            uptime = max(time.time() - self.started_at, 1e-9)
+            endpoints = {}
+            for endpoint, count in self.request_counts.items():
+                values = sorted(self.latencies[endpoint])
+                endpoints[endpoint] = {
+                    'requests': count, 'errors': self.error_counts[endpoint],
+                    'throughput_rps': round(count / uptime, 3),
+                    'latency_ms': {
+                        'mean': round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+                        'p50': round(self._percentile(values, 0.50) * 1000, 3),
+                        'p95': round(self._percentile(values, 0.95) * 1000, 3),
+                        'p99': round(self._percentile(values, 0.99) * 1000, 3),
+                    }
+                }
+            cache_total = self.cache_hits + self.cache_misses
+            return {
+                'uptime_sec': round(uptime, 3),
+                'total_requests': sum(self.request_counts.values()),
+                'throughput_rps': round(sum(self.request_counts.values()) / uptime, 3),
+                'endpoints': endpoints,
+                'batching': {
+                    'batches': self.batch_count,
+                    'avg_batch_size': round(self.batched_texts / self.batch_count, 3) if self.batch_count else 0.0,
+                    'parsed_texts': self.parsed_texts,
+                    'parse_sec_total': round(self.parse_seconds, 3),
+                },
+                'cache': {
+                    'hits': self.cache_hits, 'misses': self.cache_misses,
+                    'hit_rate': round(self.cache_hits / cache_total, 3) if cache_total else 0.0,
+                },
+            }
+
+
+def _get_text(payload):
+    text_input = payload.get('text')
+    if not isinstance(text_input, str):
+        raise RequestError("'text' (文字列) は必須です。")
+    return text_input
+
+
+def _get_filter_options(payload):
+    target_pos = payload.get('pos', DEFAULT_TARGET_POS)
+    stop_words = payload.get('stop_words')
+    if not isinstance(target_pos, list):
+        raise RequestError("'pos' は品詞のリストで指定してください。")
+    if stop_words is None:
+        stop_words_set = set(DEFAULT_STOP_WORDS)
+    elif isinstance(stop_words, list):
+        stop_words_set = {str(word).strip().lower() for word in stop_words if str(word).strip()}
+    else:
+        raise RequestError("'stop_words' は単語のリストで指定してください。")
+    return target_pos, stop_words_set
+
+
+def _get_int(payload, key, default, minimum=1):
+    value = payload.get(key, default)
+    if not isinstance(value, int) or isinstance(value, bool) or value < minimum:
+        raise RequestError(f"'{key}' は{minimum}以上の整数で指定してください。")
+    return value
+
+
+def handle_tokenize(tokenizer, payload):
+    morphemes = tokenizer.tokenize(_get_text(payload))
+    return {'total_morphemes': len(morphemes), 'morphemes': morphemes}
+
+
+def handle_report(tokenizer, payload):
+    target_pos, stop_words_set = _get_filter_options(payload)
+    morphemes = tokenizer.tokenize(_get_text(payload))
+    df_report, total_morphs, total_target_morphs = build_word_report(morphemes, target_pos, stop_words_set)
+    return {'total_morphemes': total_morphs, 'total_target_morphemes': total_target_morphs,
+            'report': df_report.to_dict(orient='records')}
+
+
+def handle_kwic(tokenizer, payload):
+    keyword = payload.get('keyword')
+    if not isinstance(keyword, str) or not keyword.strip():
+        raise RequestError("'keyword' (文字列) は必須です。")
+    mode = payload.get('mode', KWIC_MODES[0])
+    if mode not in KWIC_MODES:
+        raise RequestError(f"'mode' は {' / '.join(KWIC_MODES)} のいずれかで指定してください。")
+    window = _get_int(payload, 'window', 5)
+    morphemes = tokenizer.tokenize(_get_text(payload))
+    results = search_kwic(morphemes, keyword, mode, window)
+    return {'count': len(results), 'results': results}
+
+
+def handle_cooccurrence(tokenizer, payload):
+    text_input = _get_text(payload)
+    target_pos, stop_words_set = _get_filter_options(payload)
+    node_min_freq = _get_int(payload, 'node_min_freq', 2)
+    edge_min_freq = _get_int(payload, 'edge_min_freq', 1)
+    morphemes = tokenizer.tokenize(text_input)
+    node_candidates_dict = select_cooccurrence_nodes(morphemes, target_pos, stop_words_set, node_min_freq)
+    if len(node_candidates_dict) < 2:
+        return {'nodes': [], 'edges': []}
+    # 文単位の解析をまとめて投入し、同じバッチで処理させる (文は再利用されにくいため共有キャッシュには入れない)
+    sentence_morphemes = tokenizer.tokenize_many(split_sentences(text_input), use_cache=False)
+    cooccurrence_counts_map = count_cooccurrences(
+        ([m['原形'] for m in sentence] for sentence in sentence_morphemes), node_candidates_dict
+    )
+    edges = [{'source': a, 'target': b, 'weight': freq}
+             for (a, b), freq in cooccurrence_counts_map.most_common() if freq >= edge_min_freq]
+    used_words = {e['source'] for e in edges} | {e['target'] for e in edges}
+    nodes = [{'word': word, 'count': count} for word, count in node_candidates_dict.items() if word in used_words]
+    return {'nodes': nodes, 'edges': edges}
+
+
+POST_ROUTES = {
+    '/tokenize': handle_tokenize,
+    '/report': handle_report,
+    '/kwic': handle_kwic,
+    '/cooccurrence': handle_cooccurrence,
+}
+
+
+class AnalysisRequestHandler(BaseHTTPRequestHandler):
+    """JSONリクエストを各分析関数に振り分けるハンドラ。tokenizer / metrics はサーバー側で共有する。"""
+    server_version = f"TextMiningAPI/{APP_VERSION}"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # アクセスログはメトリクスで代替する
+
+    def _send_json(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, {'status': 'ok', 'version': APP_VERSION})
+        elif self.path == '/metrics':
+            self._send_json(200, self.server.metrics.snapshot())
+        else:
+            self._send_json(404, {'error': f"不明なパスです: {self.path}"})
+
+    def _read_content_length(self):
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            raise RequestError("Content-Length が不正です。")
+        if length < 0:
+            raise RequestError("Content-Length が不正です。")
+        return length
+
+    def do_POST(self):
+        handler = POST_ROUTES.get(self.path)
+        started = time.perf_counter()
+        status = 200
+        body_consumed = False
+        try:
+            if handler is None:
+                status = 404
+                raise RequestError(f"不明なパスです: {self.path}")
+            length = self._read_content_length()
+            if length > API_MAX_BODY_BYTES:
+                status = 413
+                raise RequestError(f"リクエストボディが上限 ({API_MAX_BODY_BYTES} バイト) を超えています。")
+            raw_body = self.rfile.read(length)
+            body_consumed = True
+            try:
+                payload = json.loads(raw_body.decode('utf-8') or '{}')
+            except (UnicodeDecodeError, json.JSONDecodeError) as e_json:
+                raise RequestError(f"JSONを解釈できません: {e_json}")
+            if not isinstance(payload, dict):
+                raise RequestError("リクエストボディはJSONオブジェクトで指定してください。")
+            body = handler(self.server.tokenizer, payload)
+        except RequestError as e_req:
+            status = status if status != 200 else 400
+            body = {'error': str(e_req)}
+        except Exception as e_internal:
+            status = 500
+            body = {'error': f"分析中にエラーが発生しました: {e_internal}"}
+        if not body_consumed:
+            self.close_connection = True  # 未読のボディが残っている可能性があるため接続を再利用しない
+        self._send_json(status, body)
+        if handler is not None:
+            self.server.metrics.record_request(self.path, time.perf_counter() - started, ok=(status == 200))
+
+
+class AnalysisHTTPServer(ThreadingHTTPServer):
+    """ウォームなTagger (BatchTokenizer) とメトリクスをリクエスト間で共有するHTTPサーバー。"""
+    daemon_threads = True
+    request_queue_size = 128  # 同時接続が多い場合に備えて listen のバックログを既定の5から広げる
+
+    def __init__(self, server_address, max_batch_size=API_BATCH_MAX_SIZE, num_workers=API_TOKENIZER_WORKERS,
+                 cache_max_chars=API_MORPH_CACHE_MAX_CHARS):
+        super().__init__(server_address, AnalysisRequestHandler)
+        self.metrics = ServiceMetrics()
+        self.tokenizer = BatchTokenizer(self.metrics, max_batch_size, num_workers, cache_max_chars)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="テキストマイニングツールのHTTP分析サービス")
+    parser.add_argument('--host', default=API_DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=API_DEFAULT_PORT)
+    parser.add_argument('--batch-size', type=int, default=API_BATCH_MAX_SIZE, help="ワーカーが1回に取り出す最大テキスト数")
+    parser.add_argument('--workers', type=int, default=API_TOKENIZER_WORKERS, help="形態素解析ワーカー数")
+    parser.add_argument('--cache-chars', type=int, default=API_MORPH_CACHE_MAX_CHARS,
+                        help="形態素解析結果キャッシュに保持するテキストの合計文字数")
+    args = parser.parse_args()
+
+    server = AnalysisHTTPServer((args.host, args.port), args.batch_size, args.workers, args.cache_chars)
+    print(f"テキスト分析サービス v{APP_VERSION} を http://{args.host}:{args.port} で起動しました。")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
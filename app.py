@@ -5,11 +5,13 @@ import os
 st.set_page_config(layout="wide", page_title="テキストマイニングツール")
 
 from config import (APP_VERSION, SESSION_KEY_MECAB_INIT, TAGGER_OPTIONS,
-                    SESSION_KEY_ANALYZED_MORPHS, SESSION_KEY_ANALYZED_TEXT,
+                    SESSION_KEY_ANALYZED_MORPHS, SESSION_KEY_ANALYZED_TEXT, SESSION_KEY_DEDUP_CLUSTERS,
                     TAB_NAME_REPORT, TAB_NAME_WC, TAB_NAME_NETWORK, TAB_NAME_KWIC,
-                    DEFAULT_ACTIVE_TAB, SESSION_KEY_ACTIVE_TAB)
-from text_analyzer import initialize_mecab_tagger, setup_japanese_font, perform_morphological_analysis
-from ui_components import show_sidebar_options, show_report_tab, show_wordcloud_tab, show_network_tab, show_kwic_tab
+                    DEFAULT_ACTIVE_TAB, SESSION_KEY_ACTIVE_TAB, INPUT_SOURCE_TEXT, INPUT_SOURCE_FILE)
+from text_analyzer import (initialize_mecab_tagger, setup_japanese_font, perform_morphological_analysis,
+                           deduplicate_records)
+from ui_components import (show_sidebar_options, show_report_tab, show_wordcloud_tab, show_network_tab, show_kwic_tab,
+                           show_dedup_summary, show_file_upload_section)
 
 tagger = initialize_mecab_tagger()
 if tagger: st.session_state[SESSION_KEY_MECAB_INIT] = True
@@ -85,85 +87,109 @@ if SESSION_KEY_ANALYZED_MORPHS not in st.session_state:
     st.session_state[SESSION_KEY_ANALYZED_MORPHS] = None
 if SESSION_KEY_ANALYZED_TEXT not in st.session_state:
     st.session_state[SESSION_KEY_ANALYZED_TEXT] = ""
+if SESSION_KEY_DEDUP_CLUSTERS not in st.session_state:
+    st.session_state[SESSION_KEY_DEDUP_CLUSTERS] = None
 if SESSION_KEY_ACTIVE_TAB not in st.session_state:
     st.session_state[SESSION_KEY_ACTIVE_TAB] = DEFAULT_ACTIVE_TAB
 
 st.title("テキストマイニングツール")
 st.markdown("日本語テキストを入力して、形態素解析、単語レポート、ワードクラウド、共起ネットワーク、KWIC検索を実行します。")
 
+input_source = st.radio("入力方法:", (INPUT_SOURCE_TEXT, INPUT_SOURCE_FILE), horizontal=True, key="input_source_radio_main")
+
 analysis_options = show_sidebar_options()
 
-st.text_area(
-    "📝 分析したい日本語テキストをここに入力してください:",
-    height=350, key='main_text_input_area_key', max_chars=50000
-)
-
-analyze_button = st.button("分析実行", type="primary", use_container_width=True)
-
-if analyze_button:
-    text_to_analyze = st.session_state.main_text_input_area_key
-    if not text_to_analyze.strip():
-        st.warning("分析するテキストを入力してください。")
-        st.session_state[SESSION_KEY_ANALYZED_MORPHS] = None
-        st.session_state[SESSION_KEY_ANALYZED_TEXT] = ""
-    elif not st.session_state.get(SESSION_KEY_MECAB_INIT, False) or tagger is None:
-        st.error("MeCab Taggerが利用できません。ページを再読み込みするか、Streamlit Cloudのログを確認してください。")
-        st.session_state[SESSION_KEY_ANALYZED_MORPHS] = None
-    else:
-        with st.spinner("形態素解析を実行中... しばらくお待ちください。"):
-            morphemes_result = perform_morphological_analysis(text_to_analyze, TAGGER_OPTIONS)
-            if not morphemes_result:
-                st.error("形態素解析に失敗したか、結果が空です。入力テキストを確認してください。")
-                st.session_state[SESSION_KEY_ANALYZED_MORPHS] = None
-            else:
-                st.success(f"形態素解析が完了しました。総形態素数: {len(morphemes_result)}")
-                st.session_state[SESSION_KEY_ANALYZED_MORPHS] = morphemes_result
-                st.session_state[SESSION_KEY_ANALYZED_TEXT] = text_to_analyze
-                st.session_state[SESSION_KEY_ACTIVE_TAB] = DEFAULT_ACTIVE_TAB
-
-if st.session_state.get(SESSION_KEY_ANALYZED_MORPHS) is not None:
-    st.markdown("---")
-    morphemes_to_display = st.session_state[SESSION_KEY_ANALYZED_MORPHS]
-    analyzed_text_for_tabs = st.session_state[SESSION_KEY_ANALYZED_TEXT] # ★分析に使ったテキストを取得
-
-    tab_names_map = {
-        TAB_NAME_REPORT: "btn_report_tab", TAB_NAME_WC: "btn_wc_tab",
-        TAB_NAME_NETWORK: "btn_network_tab", TAB_NAME_KWIC: "btn_kwic_tab"
-    }
-    tab_keys = list(tab_names_map.keys())
-    cols = st.columns(len(tab_keys))
-    for i, tab_name_key in enumerate(tab_keys):
-        button_type = "primary" if st.session_state.get(SESSION_KEY_ACTIVE_TAB) == tab_name_key else "secondary"
-        if cols[i].button(tab_name_key, use_container_width=True, key=tab_names_map[tab_name_key], type=button_type):
-            st.session_state[SESSION_KEY_ACTIVE_TAB] = tab_name_key
-            st.rerun() 
-
-    active_tab_to_render = st.session_state.get(SESSION_KEY_ACTIVE_TAB, DEFAULT_ACTIVE_TAB) 
-
-    if active_tab_to_render == TAB_NAME_REPORT:
-        show_report_tab(morphemes_to_display, 
-                        analyzed_text_for_tabs, # ★生テキストを渡す
-                        analysis_options["report_pos"],
-                        analysis_options["stop_words"])
-    elif active_tab_to_render == TAB_NAME_WC:
-        show_wordcloud_tab(morphemes_to_display, 
-                           analyzed_text_for_tabs, # ★生テキストを渡す
-                           font_path,
-                           analysis_options["wc_pos"],
-                           analysis_options["stop_words"])
-    elif active_tab_to_render == TAB_NAME_NETWORK:
-        show_network_tab(morphemes_to_display,
-                         analyzed_text_for_tabs, # ★生テキストを渡す (元々渡していた)
-                         TAGGER_OPTIONS,
-                         font_path, font_name,
-                         analysis_options["net_pos"],
-                         analysis_options["stop_words"],
-                         analysis_options["node_min_freq"],
-                         analysis_options["edge_min_freq"])
-    elif active_tab_to_render == TAB_NAME_KWIC:
-        show_kwic_tab(morphemes_to_display)
+if input_source == INPUT_SOURCE_FILE:
+    show_file_upload_section(analysis_options, font_path, font_name)
 else:
-    st.info("分析したいテキストを入力し、「分析実行」ボタンを押してください。")
+    st.text_area(
+        "📝 分析したい日本語テキストをここに入力してください:",
+        height=350, key='main_text_input_area_key', max_chars=50000
+    )
+
+    analyze_button = st.button("分析実行", type="primary", use_container_width=True)
+
+    if analyze_button:
+        text_to_analyze = st.session_state.main_text_input_area_key
+        if not text_to_analyze.strip():
+            st.warning("分析するテキストを入力してください。")
+            st.session_state[SESSION_KEY_ANALYZED_MORPHS] = None
+            st.session_state[SESSION_KEY_ANALYZED_TEXT] = ""
+        elif not st.session_state.get(SESSION_KEY_MECAB_INIT, False) or tagger is None:
+            st.error("MeCab Taggerが利用できません。ページを再読み込みするか、Streamlit Cloudのログを確認してください。")
+            st.session_state[SESSION_KEY_ANALYZED_MORPHS] = None
+        else:
+            st.session_state[SESSION_KEY_DEDUP_CLUSTERS] = None
+            if analysis_options["dedup_enabled"]:
+                with st.spinner("近似重複レコードを検出中..."):
+                    dedup_representatives, dedup_counts = deduplicate_records(
+                        text_to_analyze, analysis_options["dedup_threshold"], TAGGER_OPTIONS
+                    )
+                if dedup_representatives:
+                    st.session_state[SESSION_KEY_DEDUP_CLUSTERS] = (dedup_representatives, dedup_counts)
+                    text_to_analyze = "\n".join(dedup_representatives)
+            with st.spinner("形態素解析を実行中... しばらくお待ちください。"):
+                morphemes_result = perform_morphological_analysis(text_to_analyze, TAGGER_OPTIONS)
+                if not morphemes_result:
+                    st.error("形態素解析に失敗したか、結果が空です。入力テキストを確認してください。")
+                    st.session_state[SESSION_KEY_ANALYZED_MORPHS] = None
+                else:
+                    st.success(f"形態素解析が完了しました。総形態素数: {len(morphemes_result)}")
+                    st.session_state[SESSION_KEY_ANALYZED_MORPHS] = morphemes_result
+                    st.session_state[SESSION_KEY_ANALYZED_TEXT] = text_to_analyze
+                    st.session_state[SESSION_KEY_ACTIVE_TAB] = DEFAULT_ACTIVE_TAB
+
+    if st.session_state.get(SESSION_KEY_ANALYZED_MORPHS) is not None:
+        st.markdown("---")
+        morphemes_to_display = st.session_state[SESSION_KEY_ANALYZED_MORPHS]
+        analyzed_text_for_tabs = st.session_state[SESSION_KEY_ANALYZED_TEXT] # ★分析に使ったテキストを取得
+        if st.session_state.get(SESSION_KEY_DEDUP_CLUSTERS):
+            show_dedup_summary(*st.session_state[SESSION_KEY_DEDUP_CLUSTERS], analysis_options["dedup_weighted"])
+        # 重み付けモードでは、分析したテキストの各行 (代表行) のクラスタ件数を各タブに渡す
+        dedup_line_weights = None
+        if st.session_state.get(SESSION_KEY_DEDUP_CLUSTERS) and analysis_options["dedup_weighted"]:
+            dedup_line_weights = st.session_state[SESSION_KEY_DEDUP_CLUSTERS][1]
+
+        tab_names_map = {
+            TAB_NAME_REPORT: "btn_report_tab", TAB_NAME_WC: "btn_wc_tab",
+            TAB_NAME_NETWORK: "btn_network_tab", TAB_NAME_KWIC: "btn_kwic_tab"
+        }
+        tab_keys = list(tab_names_map.keys())
+        cols = st.columns(len(tab_keys))
+        for i, tab_name_key in enumerate(tab_keys):
+            button_type = "primary" if st.session_state.get(SESSION_KEY_ACTIVE_TAB) == tab_name_key else "secondary"
+            if cols[i].button(tab_name_key, use_container_width=True, key=tab_names_map[tab_name_key], type=button_type):
+                st.session_state[SESSION_KEY_ACTIVE_TAB] = tab_name_key
+                st.rerun() 
+
+        active_tab_to_render = st.session_state.get(SESSION_KEY_ACTIVE_TAB, DEFAULT_ACTIVE_TAB) 
+
+        if active_tab_to_render == TAB_NAME_REPORT:
+            show_report_tab(morphemes_to_display, 
+                            analyzed_text_for_tabs, # ★生テキストを渡す
+                            analysis_options["report_pos"],
+                            analysis_options["stop_words"],
+                            dedup_line_weights)
+        elif active_tab_to_render == TAB_NAME_WC:
+            show_wordcloud_tab(morphemes_to_display, 
+                               analyzed_text_for_tabs, # ★生テキストを渡す
+                               font_path,
+                               analysis_options["wc_pos"],
+                               analysis_options["stop_words"])
+        elif active_tab_to_render == TAB_NAME_NETWORK:
+            show_network_tab(morphemes_to_display,
+                             analyzed_text_for_tabs, # ★生テキストを渡す (元々渡していた)
+                             TAGGER_OPTIONS,
+                             font_path, font_name,
+                             analysis_options["net_pos"],
+                             analysis_options["stop_words"],
+                             analysis_options["node_min_freq"],
+                             analysis_options["edge_min_freq"],
+                             dedup_line_weights)
+        elif active_tab_to_render == TAB_NAME_KWIC:
+            show_kwic_tab(morphemes_to_display)
+    else:
+        st.info("分析したいテキストを入力し、「分析実行」ボタンを押してください。")
 
 st.sidebar.markdown("---")
 st.sidebar.info(f"テキストマイニングツール v{APP_VERSION}")
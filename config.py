@@ -66,6 +66,36 @@ GENERAL_STOP_WORDS = [
 ]
 
 
+# --- 重複レコード除去 (MinHash/LSH) ---
+# レコード(行)を形態素のシングル(n-gram)集合とみなし、MinHash署名とLSHで近似重複をまとめる。
+# バンド数 x 行数 = 署名長。類似度しきい値の目安は (1/バンド数)^(1/行数) 付近。
+DEDUP_SHINGLE_SIZE = 3
+DEDUP_NUM_PERM = 128
+DEDUP_LSH_BANDS = 32
+DEFAULT_DEDUP_THRESHOLD = 0.8
+DEDUP_MODE_UNIQUE = "代表行のみ分析"
+DEDUP_MODE_WEIGHTED = "クラスタ件数で重み付け"
+
+# --- ファイルアップロード ---
+INPUT_SOURCE_TEXT = "テキスト入力"
+INPUT_SOURCE_FILE = "ファイルアップロード (CSV/TXT)"
+UPLOAD_FILE_TYPES = ['csv', 'txt']
+# 自動判定で試す順 (BOM付きは先に判定)。CP932のバイト列の多くはEUC-JPとしては不正なため、EUC-JPを先に試す
+UPLOAD_ENCODING_CANDIDATES = ['utf-8', 'euc-jp', 'cp932']
+UPLOAD_ENCODING_SAMPLE_BYTES = 256 * 1024  # 文字コード判定に読むバイト数 (最初の非ASCIIバイトから)
+UPLOAD_DEDUP_SUMMARY_MAX_CLUSTERS = 1000  # ファイル分析の近似重複除去で一覧表示する重複クラスタ数の上限 (件数の多い順)
+UPLOAD_COOC_MAX_PAIRS = 100_000  # ファイル分析で保持する共起ペアの種類数の上限 (超えたら出現回数の少ないペアを刈り込む)
+
+# --- HTTP分析サービス (api_server.py) ---
+API_DEFAULT_HOST = "127.0.0.1"
+API_DEFAULT_PORT = 8765
+API_BATCH_MAX_SIZE = 32          # ワーカーが1回に取り出す (キューに溜まっている) テキスト数の上限
+API_TOKENIZER_WORKERS = min(4, os.cpu_count() or 1)  # それぞれ専用のTaggerを持つ解析ワーカー数
+API_MORPH_CACHE_MAX_CHARS = 2_000_000     # 形態素解析結果のLRUキャッシュに保持するテキストの合計文字数
+API_MORPH_CACHE_MAX_TEXT_CHARS = 200_000  # これより長いテキストの解析結果はキャッシュしない
+API_MAX_BODY_BYTES = 10 * 1024 * 1024
+API_LATENCY_WINDOW = 1000        # レイテンシ分位点の計算に使う直近リクエスト数
+
 # --- 共起ネットワークPyvisオプション ---
 PYVIS_OPTIONS_STR = """
 {
@@ -106,6 +136,8 @@ SESSION_KEY_KWIC_MODE_IDX = 'kwic_mode_idx'
 SESSION_KEY_KWIC_WINDOW_VAL = 'kwic_window_val'
 SESSION_KEY_ANALYZED_MORPHS = 'analyzed_morphemes'
 SESSION_KEY_ANALYZED_TEXT = 'analyzed_text_input'
+SESSION_KEY_DEDUP_CLUSTERS = 'dedup_clusters'
+SESSION_KEY_FILE_REPORT = 'uploaded_file_report'
 
 # --- タブ関連の定数 ---
 TAB_NAME_REPORT = "📊 単語出現レポート"
@@ -116,4 +148,4 @@ DEFAULT_ACTIVE_TAB = TAB_NAME_REPORT
 SESSION_KEY_ACTIVE_TAB = 'main_active_tab_selector'
 
 # --- アプリケーション情報 ---
-APP_VERSION = "0.3.5" # バージョン更新
+APP_VERSION = "0.3.8" # バージョン更新
@@ -13,8 +13,22 @@ import numpy as np
 from itertools import combinations
 import streamlit as st
 import html
+import zlib
+import io
+import csv
+import codecs
+import hashlib
+from array import array
 
-from config import TAGGER_OPTIONS, FONT_PATH_PRIMARY, PYVIS_OPTIONS_STR
+from config import (TAGGER_OPTIONS, FONT_PATH_PRIMARY, PYVIS_OPTIONS_STR,
+                    DEDUP_SHINGLE_SIZE, DEDUP_NUM_PERM, DEDUP_LSH_BANDS, DEFAULT_DEDUP_THRESHOLD,
+                    UPLOAD_ENCODING_CANDIDATES, UPLOAD_ENCODING_SAMPLE_BYTES)
+from analysis_core import (parse_morphemes, iter_morphemes, filter_morphemes, iter_filtered_morphemes,
+                           build_word_report, build_weighted_word_report, attach_weights, morpheme_line_indices,
+                           select_weighted_cooccurrence_nodes, split_sentences, count_weighted_cooccurrences,
+                           search_kwic, WORDCLOUD_NOUN_EXCLUSIONS)
+
+_MINHASH_PRIME = (1 << 31) - 1  # a*x+b が uint64 に収まるようにメルセンヌ素数 2^31-1 を使う
 
 @st.cache_resource
 def initialize_mecab_tagger():
@@ -75,37 +89,107 @@ def perform_morphological_analysis(text_input, _tagger_config_identifier=None):
     tagger_instance = initialize_mecab_tagger()
     if tagger_instance is None or not text_input.strip():
         return []
-    all_morphemes = []
-    node = tagger_instance.parseToNode(text_input)
-    while node:
-        if node.surface:
-            features = node.feature.split(',')
-            original_form = features[6] if features[6] != '*' else node.surface
-            reading = features[7] if len(features) > 7 and features[7] != '*' else ''
-            pronunciation = features[8] if len(features) > 8 and features[8] != '*' else ''
-            all_morphemes.append({
-                '表層形': node.surface, '原形': original_form,
-                '品詞': features[0], '品詞細分類1': features[1], '品詞細分類2': features[2],
-                '品詞細分類3': features[3], '活用型': features[4], '活用形': features[5],
-                '読み': reading, '発音': pronunciation
-            })
-        node = node.next
-    return all_morphemes
-
-def filter_morphemes(all_morphemes, target_pos_list, stop_words_set, 
-                     noun_subtype_exclusions=None, min_len_non_noun=0):
-    """指定された条件で形態素リストをフィルタリングする。"""
-    if noun_subtype_exclusions is None:
-        noun_subtype_exclusions = ['非自立', '数', '代名詞', '接尾', 'サ変接続', '副詞可能']
-    filtered_morphemes = []
-    for m in all_morphemes:
-        if m['品詞'] in target_pos_list and m['原形'].lower() not in stop_words_set:
-            if m['品詞'] == '名詞' and m['品詞細分類1'] in noun_subtype_exclusions:
-                continue
-            if m['品詞'] != '名詞' and len(m['原形']) < min_len_non_noun:
-                continue
-            filtered_morphemes.append(m)
-    return filtered_morphemes
+    return parse_morphemes(tagger_instance, text_input)
+
+_NON_ASCII_BYTE_PATTERN = re.compile(rb'[\x80-\xff]')
+_KANA_PATTERN = re.compile('[\u3041-\u30ff]')
+
+def _read_non_ascii_sample(binary_file, sample_bytes):
+    """
+    ファイルを先頭から読み進め、最初の非ASCIIバイト以降 sample_bytes バイトを返す。
+    全体がASCIIなら空のバイト列を返す。読み取り位置は呼び出し前の位置に戻す。
+    """
+    start_pos = binary_file.tell()
+    try:
+        block_start = start_pos
+        while True:
+            block = binary_file.read(sample_bytes)
+            if not block:
+                return b''
+            match = _NON_ASCII_BYTE_PATTERN.search(block)
+            if match:
+                # 直前がASCIIなので、最初の非ASCIIバイトは多バイト文字の先頭バイトになる
+                binary_file.seek(block_start + match.start())
+                return binary_file.read(sample_bytes)
+            block_start += len(block)
+    finally:
+        binary_file.seek(start_pos)
+
+def detect_file_encoding(binary_file, candidates=UPLOAD_ENCODING_CANDIDATES,
+                         sample_bytes=UPLOAD_ENCODING_SAMPLE_BYTES):
+    """
+    BOM、または最初の非ASCIIバイト以降のサンプルを候補文字コードで復号できるかで文字コードを推定する。
+    先頭がASCIIだけでも判定を打ち切らず、非ASCIIバイトが現れるまで読み進める (全体がASCIIなら utf-8)。
+    EUC-JPは仮名を1文字も含まない解釈を採用しない (CP932の半角カナ列などもEUC-JPとして復号できてしまうため)。
+    読み取り位置は呼び出し前の位置に戻す。どの候補でも復号できない場合は最後の候補を返す。
+    """
+    start_pos = binary_file.tell()
+    head = binary_file.read(4)
+    binary_file.seek(start_pos)
+    if head.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    sample = _read_non_ascii_sample(binary_file, sample_bytes)
+    if not sample:
+        return 'utf-8'
+    decodable = []
+    for encoding in candidates:
+        try:
+            # サンプル末尾で多バイト文字が途切れていても失敗にしないよう、インクリメンタルに復号する
+            decoded = codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+        except UnicodeDecodeError:
+            continue
+        if encoding == 'euc-jp' and not _KANA_PATTERN.search(decoded):
+            decodable.append(encoding)
+            continue
+        return encoding
+    return decodable[-1] if decodable else candidates[-1]
+
+def _open_text_stream(binary_file, encoding):
+    """バイナリファイルを逐次復号するテキストストリームとして開く (復号できないバイトは置換)。"""
+    return io.TextIOWrapper(binary_file, encoding=encoding, errors='replace', newline='')
+
+def read_csv_header(binary_file, encoding):
+    """CSVファイルの1行目 (列名のリスト) を返す。読み取り位置は呼び出し前の位置に戻す。"""
+    start_pos = binary_file.tell()
+    text_stream = _open_text_stream(binary_file, encoding)
+    try:
+        header = next(csv.reader(text_stream), [])
+    finally:
+        text_stream.detach()  # アップロードファイル自体は閉じない
+        binary_file.seek(start_pos)
+    return header
+
+def iter_text_records(binary_file, encoding, text_column=None, decode_stats=None):
+    """
+    アップロードファイルを逐次復号し、空でないレコード (TXTは1行、CSVは text_column 列の1セル) を順に返すジェネレータ。
+    text_column を指定した場合はCSVとして読み、1行目を列名として扱う。
+    decode_stats (辞書) を渡すと、復号できず置換された文字数を 'replaced_chars' に加算する。
+    """
+    text_stream = _open_text_stream(binary_file, encoding)
+
+    def counted_lines():
+        for line in text_stream:
+            if decode_stats is not None:
+                decode_stats['replaced_chars'] = decode_stats.get('replaced_chars', 0) + line.count('\ufffd')
+            yield line
+
+    try:
+        if text_column is None:
+            records = (line.rstrip('\r\n') for line in counted_lines())
+        else:
+            csv_reader = csv.reader(counted_lines())
+            header = next(csv_reader, [])
+            if text_column not in header:
+                raise ValueError(f"列 '{text_column}' がCSVの1行目に見つかりません。")
+            column_idx = header.index(text_column)
+            records = (row[column_idx] for row in csv_reader if len(row) > column_idx)
+        for record in records:
+            if record.strip():
+                yield record
+    finally:
+        text_stream.detach()  # アップロードファイル自体は閉じない
 
 @st.cache_data # ★キャッシュを再度有効化
 def generate_word_report(text_input_raw_for_cache_key, # ★引数追加: 生テキスト
@@ -114,33 +198,21 @@ def generate_word_report(text_input_raw_for_cache_key, # ★引数追加: 生テ
                          stop_words_set_tuple):
     """形態素リストから単語出現レポートのDataFrameを生成する。"""
     # text_input_raw_for_cache_key はキャッシュキーとして使用
-    all_morphemes = list(_all_morphemes_tuple)
-    target_pos_list = list(target_pos_list_tuple)
-    stop_words_set = set(stop_words_set_tuple)
+    return build_word_report(list(_all_morphemes_tuple), list(target_pos_list_tuple), set(stop_words_set_tuple))
 
-    if not all_morphemes:
-        return pd.DataFrame(), 0, 0
-    report_target_morphemes = filter_morphemes(
-        all_morphemes, target_pos_list, stop_words_set,
-        noun_subtype_exclusions=['非自立', '数', '代名詞', '接尾']
-    )
-    if not report_target_morphemes:
-        return pd.DataFrame(), len(all_morphemes), 0
-    word_counts = Counter(m['原形'] for m in report_target_morphemes)
-    report_data = []
-    representative_pos_info = {}
-    for m in reversed(report_target_morphemes): 
-        if m['原形'] not in representative_pos_info:
-            representative_pos_info[m['原形']] = m['品詞']
-    total_morphemes_count = len(all_morphemes)
-    for rank, (word, count) in enumerate(word_counts.most_common(), 1):
-        pos = representative_pos_info.get(word, '') 
-        frequency = (count / total_morphemes_count) * 100 if total_morphemes_count > 0 else 0
-        report_data.append({
-            '順位': rank, '単語 (原形)': word, '出現数': count,
-            '出現頻度 (%)': round(frequency, 3), '品詞': pos
-        })
-    return pd.DataFrame(report_data), total_morphemes_count, sum(word_counts.values())
+@st.cache_data
+def generate_weighted_word_report(text_input_raw_for_cache_key, _all_morphemes_tuple, line_weights_tuple,
+                                  target_pos_list_tuple, stop_words_set_tuple):
+    """
+    近似重複除去後のテキスト (1行1代表行) の形態素リストから、各形態素をその行のクラスタ件数で
+    重み付けした単語出現レポートを生成する。形態素解析済みの結果を行ごとに振り分けて再利用する。
+    """
+    # text_input_raw_for_cache_key はキャッシュキーとして使用
+    all_morphemes = list(_all_morphemes_tuple)
+    line_indices = morpheme_line_indices(text_input_raw_for_cache_key, all_morphemes)
+    morpheme_weights = [line_weights_tuple[i] for i in line_indices]
+    return build_weighted_word_report(attach_weights(all_morphemes, morpheme_weights),
+                                      list(target_pos_list_tuple), set(stop_words_set_tuple))
 
 @st.cache_data # ★キャッシュを再度有効化
 def generate_wordcloud_image(text_input_raw_for_cache_key, # ★引数追加: 生テキスト
@@ -162,19 +234,36 @@ def generate_wordcloud_image(text_input_raw_for_cache_key, # ★引数追加: 
         return None
     wordcloud_source_morphemes = filter_morphemes(
         all_morphemes, target_pos_list, stop_words_set,
-        noun_subtype_exclusions=['数', '非自立', '代名詞', '接尾']
+        noun_subtype_exclusions=WORDCLOUD_NOUN_EXCLUSIONS
     )
     wordcloud_words = [m['原形'] for m in wordcloud_source_morphemes]
     wordcloud_text_input_str = " ".join(wordcloud_words)
     if not wordcloud_text_input_str.strip(): 
         st.info("ワードクラウド表示対象の単語が見つかりませんでした（フィルタリング後）。")
         return None
+    return _render_wordcloud_figure(font_path_wc, lambda wc: wc.generate(wordcloud_text_input_str))
+
+@st.cache_data
+def generate_wordcloud_image_from_counts(counts_cache_key, _wordcloud_counts, font_path_wc):
+    """
+    集計済みの単語出現数 (原形 -> 出現数) からワードクラウド画像を生成する。
+    counts_cache_key は集計の対象と条件を表すキャッシュキー (ファイル分析のパラメータなど)。
+    """
+    if font_path_wc is None or not os.path.exists(font_path_wc): 
+        st.error(f"ワードクラウド生成に必要なフォントパス '{font_path_wc}' が見つかりません。")
+        return None
+    if not _wordcloud_counts:
+        st.info("ワードクラウド表示対象の単語が見つかりませんでした（フィルタリング後）。")
+        return None
+    return _render_wordcloud_figure(font_path_wc, lambda wc: wc.generate_from_frequencies(_wordcloud_counts))
+
+def _render_wordcloud_figure(font_path_wc, fill_wordcloud):
+    """共通の設定でWordCloudを作り、fill_wordcloud で単語を与えて描画したFigureを返す。"""
     try:
-        wc = WordCloud(font_path=font_path_wc, background_color="white", 
-                       width=800, height=400, max_words=200, 
-                       collocations=False, random_state=42,
-                       colormap='viridis', min_font_size=10
-                       ).generate(wordcloud_text_input_str)
+        wc = fill_wordcloud(WordCloud(font_path=font_path_wc, background_color="white", 
+                                      width=800, height=400, max_words=200, 
+                                      collocations=False, random_state=42,
+                                      colormap='viridis', min_font_size=10))
         fig, ax = plt.subplots(figsize=(12,6))
         ax.imshow(wc, interpolation='bilinear')
         ax.axis("off")
@@ -186,8 +275,11 @@ def generate_wordcloud_image(text_input_raw_for_cache_key, # ★引数追加: 
 @st.cache_data
 def generate_cooccurrence_network_html(_morphemes_data_tuple, text_input_co, _tagger_config_identifier, 
                                        font_path_co, font_name_co, target_pos_list_tuple, 
-                                       stop_words_set_tuple, node_min_freq, edge_min_freq):
-    """形態素リストと原文から共起ネットワークのHTMLを生成する。"""
+                                       stop_words_set_tuple, node_min_freq, edge_min_freq, line_weights_tuple=None):
+    """
+    形態素リストと原文から共起ネットワークのHTMLを生成する。
+    line_weights_tuple (原文の各行の重み、近似重複クラスタの件数など) を渡すと、ノードの出現数と共起回数を重み付けする。
+    """
     all_morphemes = list(_morphemes_data_tuple)
     target_pos_list = list(target_pos_list_tuple)
     stop_words_set = set(stop_words_set_tuple)
@@ -199,32 +291,45 @@ def generate_cooccurrence_network_html(_morphemes_data_tuple, text_input_co, _ta
     if font_path_co is None or not os.path.exists(font_path_co) or font_name_co is None:
         st.error(f"共起ネットワークのラベル表示に必要な日本語フォント '{font_path_co}' が見つからないか、フォント名が未設定です。")
         return None
-    node_candidate_morphemes = filter_morphemes(
-        all_morphemes, target_pos_list, stop_words_set,
-        noun_subtype_exclusions=['非自立', '数', '代名詞', '接尾', 'サ変接続', '副詞可能'],
-        min_len_non_noun=2
-    )
-    temp_words_for_nodes = [m['原形'] for m in node_candidate_morphemes]
-    word_counts = Counter(temp_words_for_nodes)
-    node_candidates_dict = {word: count for word, count in word_counts.items() if count >= node_min_freq}
+    text_lines = text_input_co.split('\n')
+    if line_weights_tuple is None:
+        line_weights_tuple = (1,) * len(text_lines)
+        weighted_morphemes = ((m, 1) for m in all_morphemes)
+    else:
+        line_indices = morpheme_line_indices(text_input_co, all_morphemes)
+        weighted_morphemes = attach_weights(all_morphemes, [line_weights_tuple[i] for i in line_indices])
+    node_candidates_dict = select_weighted_cooccurrence_nodes(weighted_morphemes, target_pos_list,
+                                                              stop_words_set, node_min_freq)
     if len(node_candidates_dict) < 2:
         st.info(f"共起ネットワークのノードとなる単語（フィルタ後、出現数{node_min_freq}以上）が2つ未満です。")
         return None
-    sentences = re.split(r'[。\n！？]+', text_input_co)
-    sentences = [s.strip() for s in sentences if s.strip()]
-    cooccurrence_counts_map = Counter()
-    for sentence in sentences:
-        node_s = tagger_instance.parseToNode(sentence)
-        words_in_sentence = []
-        while node_s:
-            if node_s.surface:
-                features = node_s.feature.split(',')
-                original_form = features[6] if features[6] != '*' else node_s.surface
-                if original_form in node_candidates_dict: 
-                    words_in_sentence.append(original_form)
-            node_s = node_s.next
-        for pair in combinations(sorted(list(set(words_in_sentence))), 2):
-            cooccurrence_counts_map[pair] += 1
+    # 文の区切りには改行も含まれるため、行ごとに文へ分割すれば各文の重みはその行の重みになる
+    weighted_sentence_words = (([m['原形'] for m in parse_morphemes(tagger_instance, sentence)], line_weight)
+                               for line, line_weight in attach_weights(text_lines, line_weights_tuple)
+                               for sentence in split_sentences(line))
+    cooccurrence_counts_map = count_weighted_cooccurrences(weighted_sentence_words, node_candidates_dict)
+    return _build_cooccurrence_network_html(node_candidates_dict, cooccurrence_counts_map, font_name_co, edge_min_freq)
+
+@st.cache_data
+def generate_cooccurrence_network_html_from_counts(counts_cache_key, _node_counts, _pair_counts,
+                                                   font_path_co, font_name_co, node_min_freq, edge_min_freq):
+    """
+    集計済みの単語出現数 (原形 -> 出現数) と共起回数 ((原形, 原形) -> 回数) から共起ネットワークのHTMLを生成する。
+    counts_cache_key は集計の対象と条件を表すキャッシュキー (ファイル分析のパラメータなど)。
+    """
+    if font_path_co is None or not os.path.exists(font_path_co) or font_name_co is None:
+        st.error(f"共起ネットワークのラベル表示に必要な日本語フォント '{font_path_co}' が見つからないか、フォント名が未設定です。")
+        return None
+    node_candidates_dict = {word: count for word, count in _node_counts.items() if count >= node_min_freq}
+    if len(node_candidates_dict) < 2:
+        st.info(f"共起ネットワークのノードとなる単語（フィルタ後、出現数{node_min_freq}以上）が2つ未満です。")
+        return None
+    cooccurrence_counts_map = {pair: count for pair, count in _pair_counts.items()
+                               if pair[0] in node_candidates_dict and pair[1] in node_candidates_dict}
+    return _build_cooccurrence_network_html(node_candidates_dict, cooccurrence_counts_map, font_name_co, edge_min_freq)
+
+def _build_cooccurrence_network_html(node_candidates_dict, cooccurrence_counts_map, font_name_co, edge_min_freq):
+    """ノード候補 (原形 -> 出現数) と共起回数から pyvis のネットワークを組み立て、HTMLを返す。"""
     if not cooccurrence_counts_map:
         st.info("共起ペアが見つかりませんでした。")
         return None
@@ -264,20 +369,142 @@ def generate_cooccurrence_network_html(_morphemes_data_tuple, text_input_co, _ta
 @st.cache_data
 def perform_kwic_search(_morphemes_data_tuple, keyword_str, search_key_type_str, window_int):
     """指定されたキーワードでKWIC検索を実行する。"""
-    all_morphemes = list(_morphemes_data_tuple)
-    if not keyword_str.strip() or not all_morphemes:
-        return []
-    kwic_results_data = []
-    keyword_to_compare = keyword_str.strip().lower()
-    for i, morpheme_item in enumerate(all_morphemes):
-        target_text_in_morpheme = morpheme_item[search_key_type_str].lower()
-        if target_text_in_morpheme == keyword_to_compare:
-            left_start_idx = max(0, i - window_int)
-            left_context_str = "".join(m['表層形'] for m in all_morphemes[left_start_idx:i])
-            keyword_surface_form = morpheme_item['表層形']
-            right_end_idx = min(len(all_morphemes), i + 1 + window_int)
-            right_context_str = "".join(m['表層形'] for m in all_morphemes[i+1:right_end_idx])
-            kwic_results_data.append({
-                '左文脈': left_context_str, 'キーワード': keyword_surface_form, '右文脈': right_context_str
-            })
-    return kwic_results_data
+    return search_kwic(list(_morphemes_data_tuple), keyword_str, search_key_type_str, window_int)
+
+def extract_record_shingles(tagger_instance, record_text, shingle_size=DEDUP_SHINGLE_SIZE):
+    """レコードを形態素(表層形)に分割し、n-gramシングルのハッシュ値集合を返す。"""
+    surfaces = []
+    node = tagger_instance.parseToNode(record_text)
+    while node:
+        if node.surface:
+            surfaces.append(node.surface)
+        node = node.next
+    if not surfaces:
+        return set()
+    if len(surfaces) < shingle_size:
+        shingles = [tuple(surfaces)]
+    else:
+        shingles = [tuple(surfaces[i:i + shingle_size]) for i in range(len(surfaces) - shingle_size + 1)]
+    return {zlib.crc32('\x1f'.join(shingle).encode('utf-8')) for shingle in shingles}
+
+def make_minhash_params(num_perm=DEDUP_NUM_PERM, seed=42):
+    """MinHash用のハッシュ関数族 h(x) = (a*x + b) mod p の係数 (a, b) を生成する。"""
+    rng = np.random.RandomState(seed)
+    hash_a = rng.randint(1, _MINHASH_PRIME, size=num_perm).astype(np.uint64)
+    hash_b = rng.randint(0, _MINHASH_PRIME, size=num_perm).astype(np.uint64)
+    return hash_a, hash_b
+
+def compute_minhash_signature(shingle_hashes, hash_a, hash_b):
+    """シングルのハッシュ値集合からMinHash署名 (長さ num_perm の配列) を計算する。"""
+    if not shingle_hashes:
+        return np.full(len(hash_a), _MINHASH_PRIME, dtype=np.uint64)
+    x = np.fromiter(shingle_hashes, dtype=np.uint64, count=len(shingle_hashes)) % np.uint64(_MINHASH_PRIME)
+    hashed = (np.outer(hash_a, x) + hash_b[:, None]) % np.uint64(_MINHASH_PRIME)
+    return hashed.min(axis=1)
+
+def cluster_near_duplicates(signatures, num_bands=DEDUP_LSH_BANDS, threshold=DEFAULT_DEDUP_THRESHOLD):
+    """
+    MinHash署名行列をLSHのバンドごとにバケット化し、近似重複のクラスタを求める。
+    同じバケットのレコードは、そのバケット内で既に見つかった各クラスタの代表と署名一致率(推定Jaccard類似度)で
+    比較する。バケット内のクラスタ数に比例する比較で済むため、全ペア比較は行わない。
+    ただし代表とは似ていないが同じクラスタの別メンバーにだけ似ているレコードは、このバンドでは結合されない。
+    各レコードが属するクラスタの代表インデックス(最小インデックス)の配列を返す。
+    """
+    n_records, num_perm = signatures.shape
+    parent = np.arange(n_records)
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    rows_per_band = num_perm // num_bands
+    for band in range(num_bands):
+        band_slice = signatures[:, band * rows_per_band:(band + 1) * rows_per_band]
+        _, inverse, bucket_sizes = np.unique(band_slice, axis=0, return_inverse=True, return_counts=True)
+        inverse = inverse.reshape(-1)
+        if bucket_sizes.max() < 2:
+            continue
+        order = np.argsort(inverse, kind='stable')  # バケットごとに、元の順序を保って並べる
+        bucket_starts = np.concatenate(([0], np.cumsum(bucket_sizes)[:-1]))
+        for bucket_start, bucket_size in zip(bucket_starts[bucket_sizes > 1], bucket_sizes[bucket_sizes > 1]):
+            members = order[bucket_start:bucket_start + bucket_size]
+            cluster_heads = [members[0]]
+            for i in members[1:]:
+                root_i = find(i)
+                if any(find(head) == root_i for head in cluster_heads):
+                    continue
+                similarities = (signatures[cluster_heads] == signatures[i]).mean(axis=1)
+                matched = [head for head, sim in zip(cluster_heads, similarities) if sim >= threshold]
+                if not matched:
+                    cluster_heads.append(i)
+                    continue
+                for head in matched:
+                    root_i, root_head = find(i), find(head)
+                    if root_i != root_head:
+                        parent[max(root_i, root_head)] = min(root_i, root_head)
+    return np.array([find(i) for i in range(n_records)])
+
+def compute_record_clusters(tagger_instance, records_iter, threshold=DEFAULT_DEDUP_THRESHOLD):
+    """
+    レコードのストリームを1回走査し、MinHash/LSHで近似重複のクラスタを求める。
+    レコード本文は保持せず、異なりレコードごとの署名 (uint32) とレコード -> 異なりレコードの対応だけを持つため、
+    ファイルのように全体を読み込めない入力にも使える。完全一致の重複は本文のダイジェストでまとめてから署名を計算する。
+    (各レコードの異なりレコード番号の配列, 各異なりレコードのクラスタ代表番号の配列, 異なりレコード番号ごとの
+    クラスタ件数の配列) を返す。代表番号は各クラスタで最初に現れた異なりレコードの番号。
+    """
+    hash_a, hash_b = make_minhash_params()
+    unique_index = {}
+    record_to_unique = array('l')
+    signature_buffer = bytearray()
+    for record in records_iter:
+        digest = hashlib.blake2b(record.encode('utf-8'), digest_size=16).digest()
+        unique_id = unique_index.get(digest)
+        if unique_id is None:
+            unique_id = unique_index[digest] = len(unique_index)
+            signature = compute_minhash_signature(extract_record_shingles(tagger_instance, record), hash_a, hash_b)
+            signature_buffer += signature.astype(np.uint32).tobytes()  # 署名の値は 2^31-1 以下
+        record_to_unique.append(unique_id)
+    record_to_unique = np.array(record_to_unique, dtype=np.int64)
+    if not unique_index:
+        return record_to_unique, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    signatures = np.frombuffer(bytes(signature_buffer), dtype=np.uint32).reshape(len(unique_index), len(hash_a))
+    cluster_roots = cluster_near_duplicates(signatures, threshold=threshold)
+    cluster_sizes = np.bincount(cluster_roots[record_to_unique], minlength=len(unique_index))
+    return record_to_unique, cluster_roots, cluster_sizes
+
+def iter_cluster_representatives(records_iter, record_to_unique, cluster_roots, cluster_sizes):
+    """
+    compute_record_clusters に渡したものと同じ順序のレコードのストリームから、各クラスタの代表 (初出) レコードだけを
+    (レコード, クラスタ件数) の組で順に返すジェネレータ。レコード数が一致しない場合は ValueError。
+    """
+    emitted = np.zeros(len(cluster_roots), dtype=bool)
+    record_count = 0
+    for record_pos, record in enumerate(records_iter):
+        if record_pos >= len(record_to_unique):
+            raise ValueError("近似重複の検出時よりレコードが多くなっています。ファイルが変更された可能性があります。")
+        unique_id = record_to_unique[record_pos]
+        record_count = record_pos + 1
+        if cluster_roots[unique_id] == unique_id and not emitted[unique_id]:
+            emitted[unique_id] = True
+            yield record, int(cluster_sizes[unique_id])
+    if record_count != len(record_to_unique):
+        raise ValueError("近似重複の検出時よりレコードが少なくなっています。ファイルが変更された可能性があります。")
+
+@st.cache_data
+def deduplicate_records(text_input, threshold, _tagger_config_identifier=None):
+    """
+    テキストを1行1レコードとみなし、MinHash/LSHで近似重複レコードをまとめる。
+    (代表レコードのリスト, 各代表レコードのクラスタ件数のリスト) を返す。代表は各クラスタの初出レコード。
+    """
+    tagger_instance = initialize_mecab_tagger()
+    records = [line.strip() for line in text_input.splitlines() if line.strip()]
+    if tagger_instance is None or not records:
+        return [], []
+    cluster_info = compute_record_clusters(tagger_instance, records, threshold)
+    representatives, counts = [], []
+    for record, cluster_size in iter_cluster_representatives(records, *cluster_info):
+        representatives.append(record)
+        counts.append(cluster_size)
+    return representatives, counts
@@ -3,12 +3,21 @@ import streamlit as st
 import pandas as pd
 import re
 import os 
+import csv
+import heapq
 
-from config import (DEFAULT_TARGET_POS, GENERAL_STOP_WORDS,
+from config import (DEFAULT_TARGET_POS, GENERAL_STOP_WORDS, DEFAULT_DEDUP_THRESHOLD,
+                    DEDUP_MODE_UNIQUE, DEDUP_MODE_WEIGHTED,
                     SESSION_KEY_KWIC_KEYWORD, SESSION_KEY_KWIC_MODE_IDX, SESSION_KEY_KWIC_WINDOW_VAL,
-                    SESSION_KEY_ACTIVE_TAB, TAB_NAME_KWIC)
-from text_analyzer import (generate_word_report, generate_wordcloud_image,
-                           generate_cooccurrence_network_html, perform_kwic_search)
+                    SESSION_KEY_ACTIVE_TAB, TAB_NAME_KWIC, SESSION_KEY_MECAB_INIT, SESSION_KEY_FILE_REPORT,
+                    UPLOAD_FILE_TYPES, UPLOAD_ENCODING_CANDIDATES, UPLOAD_COOC_MAX_PAIRS,
+                    UPLOAD_DEDUP_SUMMARY_MAX_CLUSTERS)
+from text_analyzer import (generate_word_report, generate_weighted_word_report, generate_wordcloud_image,
+                           generate_cooccurrence_network_html, perform_kwic_search,
+                           generate_wordcloud_image_from_counts, generate_cooccurrence_network_html_from_counts,
+                           initialize_mecab_tagger, detect_file_encoding, read_csv_header, iter_text_records,
+                           compute_record_clusters, iter_cluster_representatives)
+from analysis_core import iter_weighted_record_morphemes, aggregate_weighted_records, word_report_from_counts
 
 def show_sidebar_options():
     """サイドバーの分析オプションUIを表示し、選択された値を辞書で返す。"""
@@ -36,25 +45,70 @@ def show_sidebar_options():
     st.sidebar.markdown("**共起ネットワーク詳細設定**")
     node_min_freq = st.sidebar.slider("ノード最低出現数:", 1, 20, 2, key="net_node_freq_slider_main")
     edge_min_freq = st.sidebar.slider("エッジ最低共起数:", 1, 10, 1, key="net_edge_freq_slider_main") 
+    st.sidebar.markdown("---")
+    st.sidebar.markdown("**近似重複レコードの除去**")
+    dedup_enabled = st.sidebar.checkbox(
+        "近似重複の行をまとめて分析する", value=False, key="dedup_enabled_checkbox_main",
+        help="1行 (CSVファイルでは分析列の1セル) を1レコードとみなし、定型文などほぼ同じ行はクラスタの代表行1件のみを分析対象にします。"
+    )
+    dedup_threshold = st.sidebar.slider(
+        "重複とみなす類似度:", 0.5, 1.0, DEFAULT_DEDUP_THRESHOLD, 0.05,
+        key="dedup_threshold_slider_main", disabled=not dedup_enabled
+    )
+    dedup_mode = st.sidebar.radio(
+        "単語出現レポートの数え方:", (DEDUP_MODE_UNIQUE, DEDUP_MODE_WEIGHTED),
+        key="dedup_mode_radio_main", disabled=not dedup_enabled,
+        help="「クラスタ件数で重み付け」では、単語出現レポートと共起ネットワーク (ファイル分析ではワードクラウドも) で代表行の出現数をクラスタの行数倍して数えます (形態素解析は代表行のみ)。"
+    )
     return {
         "report_pos": report_target_pos, "wc_pos": wc_target_pos, "net_pos": net_target_pos,
-        "stop_words": final_stop_words, "node_min_freq": node_min_freq, "edge_min_freq": edge_min_freq
+        "stop_words": final_stop_words, "node_min_freq": node_min_freq, "edge_min_freq": edge_min_freq,
+        "dedup_enabled": dedup_enabled, "dedup_threshold": dedup_threshold,
+        "dedup_weighted": dedup_enabled and dedup_mode == DEDUP_MODE_WEIGHTED
     }
 
-def show_report_tab(morphemes_data, analyzed_text, target_pos, stop_words): # ★引数 analyzed_text を追加
-    """「単語出現レポート」タブの内容を表示する。"""
+def show_dedup_summary(representatives, counts, weighted):
+    """近似重複除去の結果 (クラスタごとの代表行と件数) を表示する。"""
+    duplicated = [(rep, cnt) for rep, cnt in zip(representatives, counts) if cnt > 1]
+    _show_dedup_clusters(sum(counts), len(representatives), duplicated,
+                         DEDUP_MODE_WEIGHTED + " (単語出現レポート・共起ネットワーク)" if weighted else DEDUP_MODE_UNIQUE)
+
+def _show_dedup_clusters(total_records, cluster_count, duplicated, mode_label):
+    """近似重複除去の件数と、重複としてまとめられたクラスタ ((代表行, 件数) のリスト) を表示する。"""
+    st.caption(f"近似重複除去: {total_records} 行 → {cluster_count} クラスタ | {mode_label}")
+    if not duplicated:
+        return
+    with st.expander(f"重複としてまとめられた行 ({len(duplicated)} クラスタ)"):
+        df_dedup = pd.DataFrame(duplicated, columns=['代表行', '件数']).sort_values('件数', ascending=False)
+        st.dataframe(df_dedup.reset_index(drop=True))
+
+def show_report_tab(morphemes_data, analyzed_text, target_pos, stop_words, dedup_weights=None): # ★引数 analyzed_text を追加
+    """
+    「単語出現レポート」タブの内容を表示する。
+    dedup_weights に analyzed_text の各行 (近似重複の代表行) のクラスタ件数を渡すと、件数で重み付けして集計する。
+    """
     st.subheader("📊 単語出現レポート")
     with st.spinner("レポート作成中..."):
-        df_report, total_morphs, total_target_morphs = generate_word_report(
-            analyzed_text, # ★生テキストを渡す
-            tuple(morphemes_data), tuple(target_pos), tuple(stop_words)
-        )
-        st.caption(f"総形態素数: {total_morphs} | レポート対象の異なり語数: {len(df_report)} | レポート対象の延べ語数: {total_target_morphs}")
-        if not df_report.empty:
-            st.dataframe(df_report.style.bar(subset=['出現数'], align='left', color='#90EE90')
-                                     .format({'出現頻度 (%)': "{:.3f}%"}))
+        if dedup_weights:
+            df_report, total_morphs, total_target_morphs = generate_weighted_word_report(
+                analyzed_text, tuple(morphemes_data), tuple(dedup_weights), tuple(target_pos), tuple(stop_words)
+            )
+            st.caption("出現数・総形態素数は近似重複クラスタの件数で重み付けしています。")
         else:
-            st.info("レポート対象の単語が見つかりませんでした。")
+            df_report, total_morphs, total_target_morphs = generate_word_report(
+                analyzed_text, # ★生テキストを渡す
+                tuple(morphemes_data), tuple(target_pos), tuple(stop_words)
+            )
+        _show_word_report_table(df_report, total_morphs, total_target_morphs)
+
+def _show_word_report_table(df_report, total_morphs, total_target_morphs):
+    """単語出現レポートの集計値とテーブルを表示する。"""
+    st.caption(f"総形態素数: {total_morphs} | レポート対象の異なり語数: {len(df_report)} | レポート対象の延べ語数: {total_target_morphs}")
+    if not df_report.empty:
+        st.dataframe(df_report.style.bar(subset=['出現数'], align='left', color='#90EE90')
+                                 .format({'出現頻度 (%)': "{:.3f}%"}))
+    else:
+        st.info("レポート対象の単語が見つかりませんでした。")
 
 def show_wordcloud_tab(morphemes_data, analyzed_text, font_path, target_pos, stop_words): # ★引数 analyzed_text を追加
     """「ワードクラウド」タブの内容を表示する。"""
@@ -70,8 +124,9 @@ def show_wordcloud_tab(morphemes_data, analyzed_text, font_path, target_pos, sto
     else:
         st.error("日本語フォントの準備ができていません。ワードクラウドは表示できません。")
 
-def show_network_tab(morphemes_data, text_input, tagger_dummy, font_path, font_name, target_pos, stop_words, node_min_freq, edge_min_freq):
-    """「共起ネットワーク」タブの内容を表示する。"""
+def show_network_tab(morphemes_data, text_input, tagger_dummy, font_path, font_name, target_pos, stop_words, node_min_freq, edge_min_freq,
+                     dedup_weights=None):
+    """「共起ネットワーク」タブの内容を表示する。dedup_weights は show_report_tab と同じ (各行のクラスタ件数)。"""
     # この関数は既に text_input (生テキスト) を引数に取っているので変更なし
     st.subheader("🕸️ 共起ネットワーク")
     if font_path and font_name:
@@ -79,8 +134,10 @@ def show_network_tab(morphemes_data, text_input, tagger_dummy, font_path, font_n
             html_cooc = generate_cooccurrence_network_html(
                 tuple(morphemes_data), text_input, tagger_dummy,
                 font_path, font_name, tuple(target_pos), tuple(stop_words),
-                node_min_freq, edge_min_freq
+                node_min_freq, edge_min_freq, tuple(dedup_weights) if dedup_weights else None
             )
+            if dedup_weights:
+                st.caption("ノードの出現数・共起回数は近似重複クラスタの件数で重み付けしています。")
             if html_cooc:
                 st.components.v1.html(html_cooc, height=750, scrolling=True)
     else:
@@ -131,3 +188,151 @@ def show_kwic_tab(morphemes_data):
             st.dataframe(df_kwic_to_display_final)
         else:
             st.info(f"「{kw_to_search}」は見つかりませんでした（現在の検索モードにおいて）。")
+
+def show_file_upload_section(analysis_options, font_path, font_name):
+    """
+    ファイルアップロードによる分析のUIを表示する。
+    ファイルはレコード単位で逐次復号・形態素解析し、単語出現レポート・ワードクラウド・共起ネットワークの
+    集計を1回の走査で行う。全文や全形態素のリストは保持しないため、KWIC検索は行わない。
+    近似重複除去が有効な場合は、先にファイルを1回走査して署名からクラスタを求め、2回目の走査で代表レコードだけを解析する。
+    """
+    uploaded_file = st.file_uploader(
+        "📁 分析したいCSV/TXTファイルを選択してください:", type=UPLOAD_FILE_TYPES, key="upload_file_uploader_main"
+    )
+    if uploaded_file is None:
+        st.info("ファイルを選択し、「ファイルを分析」ボタンを押してください。")
+        return
+    uploaded_file.seek(0)
+    encoding_options = ["自動判定"] + UPLOAD_ENCODING_CANDIDATES
+    encoding_choice = st.selectbox("文字コード:", encoding_options, key="upload_encoding_select_main")
+    if encoding_choice == "自動判定":
+        encoding = detect_file_encoding(uploaded_file)
+        st.caption(f"判定された文字コード: {encoding}")
+    else:
+        encoding = encoding_choice
+    text_column = None
+    if uploaded_file.name.lower().endswith('.csv'):
+        header = read_csv_header(uploaded_file, encoding)
+        if not header:
+            st.warning("CSVの1行目 (列名) を読み取れませんでした。文字コードを確認してください。")
+            return
+        text_column = st.selectbox("分析するテキスト列:", header, key="upload_text_column_select_main")
+
+    # 集計結果はファイルと集計条件の組に対して保持し、どれかが変わったら破棄する
+    # (ノード・エッジの最低出現数は表示時に適用するため含めない)
+    report_params = (getattr(uploaded_file, 'file_id', None), uploaded_file.name, uploaded_file.size,
+                     encoding, text_column, tuple(analysis_options["report_pos"]),
+                     tuple(analysis_options["wc_pos"]), tuple(analysis_options["net_pos"]),
+                     tuple(sorted(analysis_options["stop_words"])), analysis_options["dedup_enabled"],
+                     analysis_options["dedup_threshold"], analysis_options["dedup_weighted"])
+    file_report = st.session_state.get(SESSION_KEY_FILE_REPORT)
+    if file_report and file_report[0] != report_params:
+        st.session_state[SESSION_KEY_FILE_REPORT] = None
+        st.info("ファイルまたは分析条件が変更されました。「ファイルを分析」を押して再集計してください。")
+
+    if st.button("ファイルを分析", type="primary", use_container_width=True, key="upload_analyze_button_main"):
+        tagger_instance = initialize_mecab_tagger()
+        if not st.session_state.get(SESSION_KEY_MECAB_INIT, False) or tagger_instance is None:
+            st.error("MeCab Taggerが利用できません。ページを再読み込みするか、Streamlit Cloudのログを確認してください。")
+            return
+        file_size = max(uploaded_file.size, 1)
+        progress_bar = st.progress(0.0, text="ファイルを読み込み中...")
+
+        decode_stats = {'replaced_chars': 0}
+
+        def records_with_progress(progress_label, stats=None):
+            shown_percent = -1
+            uploaded_file.seek(0)
+            for record in iter_text_records(uploaded_file, encoding, text_column, decode_stats=stats):
+                yield record
+                read_percent = min(uploaded_file.tell() * 100 // file_size, 100)
+                if read_percent != shown_percent:
+                    shown_percent = read_percent
+                    progress_bar.progress(read_percent / 100, text=f"{progress_label} {read_percent}%")
+
+        dedup_summary = None
+        try:
+            if analysis_options["dedup_enabled"]:
+                cluster_info = compute_record_clusters(
+                    tagger_instance, records_with_progress("近似重複レコードを検出中..."),
+                    analysis_options["dedup_threshold"]
+                )
+                record_to_unique, cluster_roots, cluster_sizes = cluster_info
+                duplicated = []  # 件数の多い重複クラスタ上位のみを (件数, 出現順, 代表行) のヒープで保持する
+                representative_records = iter_cluster_representatives(
+                    records_with_progress("形態素解析中...", decode_stats), *cluster_info
+                )
+
+                def weighted_representatives():
+                    for cluster_pos, (record, cluster_size) in enumerate(representative_records):
+                        if cluster_size > 1:
+                            entry = (cluster_size, -cluster_pos, record)
+                            if len(duplicated) < UPLOAD_DEDUP_SUMMARY_MAX_CLUSTERS:
+                                heapq.heappush(duplicated, entry)
+                            else:
+                                heapq.heappushpop(duplicated, entry)
+                        yield record, cluster_size if analysis_options["dedup_weighted"] else 1
+
+                weighted_records = weighted_representatives()
+            else:
+                weighted_records = ((record, 1) for record in records_with_progress("形態素解析中...", decode_stats))
+            aggregated = aggregate_weighted_records(
+                iter_weighted_record_morphemes(tagger_instance, weighted_records),
+                analysis_options["report_pos"], analysis_options["wc_pos"], analysis_options["net_pos"],
+                analysis_options["stop_words"], max_pairs=UPLOAD_COOC_MAX_PAIRS
+            )
+            if analysis_options["dedup_enabled"]:
+                dedup_summary = (len(record_to_unique), int((cluster_sizes > 0).sum()),
+                                 [(record, size) for size, _, record in sorted(duplicated, reverse=True)])
+        except (ValueError, csv.Error) as e_read:
+            st.error(f"ファイルの読み込み中にエラーが発生しました: {e_read}")
+            return
+        finally:
+            progress_bar.empty()
+        st.session_state[SESSION_KEY_FILE_REPORT] = (report_params, aggregated, dedup_summary)
+        st.success(f"形態素解析が完了しました。総形態素数: {aggregated['total_morphemes']}")
+        if decode_stats['replaced_chars']:
+            st.warning(f"文字コード {encoding} で復号できない文字が {decode_stats['replaced_chars']} 文字あり、"
+                       "置換文字 (�) として扱いました。文字コードの指定を確認してください。")
+
+    file_report = st.session_state.get(SESSION_KEY_FILE_REPORT)
+    if file_report:
+        report_params, aggregated, dedup_summary = file_report
+        st.markdown("---")
+        if dedup_summary:
+            total_records, cluster_count, duplicated = dedup_summary
+            _show_dedup_clusters(total_records, cluster_count, duplicated,
+                                 DEDUP_MODE_WEIGHTED + " (単語出現レポート・ワードクラウド・共起ネットワーク)"
+                                 if analysis_options["dedup_weighted"] else DEDUP_MODE_UNIQUE)
+            if len(duplicated) >= UPLOAD_DEDUP_SUMMARY_MAX_CLUSTERS:
+                st.caption(f"重複クラスタは件数の多い上位 {UPLOAD_DEDUP_SUMMARY_MAX_CLUSTERS} 件のみ表示しています。")
+        st.subheader(f"📊 単語出現レポート ({uploaded_file.name})")
+        _show_word_report_table(*word_report_from_counts(
+            aggregated['report_counts'], aggregated['report_pos_info'], aggregated['total_morphemes']
+        ))
+        st.markdown("---")
+        st.subheader("☁️ ワードクラウド")
+        if font_path:
+            with st.spinner("ワードクラウド生成中..."):
+                fig_wc = generate_wordcloud_image_from_counts(report_params, aggregated['wordcloud_counts'], font_path)
+                if fig_wc:
+                    st.pyplot(fig_wc)
+        else:
+            st.error("日本語フォントの準備ができていません。ワードクラウドは表示できません。")
+        st.markdown("---")
+        st.subheader("🕸️ 共起ネットワーク")
+        if font_path and font_name:
+            with st.spinner("共起ネットワーク生成中..."):
+                html_cooc = generate_cooccurrence_network_html_from_counts(
+                    report_params, aggregated['node_counts'], aggregated['pair_counts'], font_path, font_name,
+                    analysis_options["node_min_freq"], analysis_options["edge_min_freq"]
+                )
+                if aggregated['pairs_pruned']:
+                    st.caption(f"共起ペアの種類が上限 ({UPLOAD_COOC_MAX_PAIRS:,}) を超えたため、共起回数の少ないペアを"
+                               "途中で刈り込みました。共起回数は実際より少ない場合があります。")
+                if html_cooc:
+                    st.components.v1.html(html_cooc, height=750, scrolling=True)
+        else:
+            st.error("日本語フォントの準備ができていません。共起ネットワークは表示できません。")
+        st.caption("KWIC検索は全形態素の並びを保持する必要があるため、ファイル分析では利用できません。"
+                   "テキスト入力で実行してください。")